@@ -1,6 +1,7 @@
 """Fixed blocking service — bounded concurrency + admission control.
 
 POST /scan/blocking  → inline scan with bulkhead + fast-fail (429/503)
+POST /admin/cmax     → resize the admission limit at runtime
 GET  /metrics        → inflight, completed, rejected counts
 """
 
@@ -9,23 +10,28 @@ from __future__ import annotations
 import asyncio
 import os
 import sys
-import uuid
+import time
+from array import array
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 
 sys.path.insert(0, os.path.dirname(__file__))
 
+from common.ids import new_request_id
 from common.models import (
     BlockingScanResponse,
-    ErrorResponse,
+    CapacityRequest,
+    CapacityResponse,
     MetricsResponse,
     ScanRequest,
     ScanVerdict,
+    error_detail,
 )
 from common.simulate import (
-    Timer,
     decide_verdict,
+    is_ready,
     now_iso,
     simulate_scan,
     warm_startup_load,
@@ -36,78 +42,147 @@ from common.simulate import (
 MAX_BLOCKING_CONCURRENCY = int(os.environ.get("MAX_BLOCKING_CONCURRENCY", "24"))
 BLOCKING_ADMISSION_TIMEOUT_MS = int(os.environ.get("BLOCKING_ADMISSION_TIMEOUT_MS", "100"))
 BLOCKING_DEADLINE_SECONDS = float(os.environ.get("BLOCKING_DEADLINE_SECONDS", "10"))
+BLOCKING_MAX_WAIT_QUEUE = int(
+    os.environ.get("BLOCKING_MAX_WAIT_QUEUE", str(max(8, MAX_BLOCKING_CONCURRENCY // 2)))
+)
 
 # ── State ───────────────────────────────────────────────────────────────────
 
-_semaphore: asyncio.Semaphore
-_metrics = {
-    "inflight": 0,
-    "completed": 0,
-    "rejected": 0,
-    "errors": 0,
-}
+# Admission controller: an explicit inflight counter guarded by a Condition.
+# Unlike asyncio.Semaphore, the limit (_cmax) can be resized at runtime.
+_cond: asyncio.Condition
+_inflight = 0
+_waiting = 0  # requests currently waiting for admission
+_cmax = MAX_BLOCKING_CONCURRENCY
+
+# Hot counters live in a fixed int64 array indexed by these constants.
+M_COMPLETED, M_REJECTED, M_ERRORS = 0, 1, 2
+_m = array("q", [0] * 3)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _semaphore
-    _semaphore = asyncio.Semaphore(MAX_BLOCKING_CONCURRENCY)
-    await warm_startup_load()
+    global _cond
+    _cond = asyncio.Condition()
+    # Warm up in the background so /health answers (and scans get a clean
+    # 503) while the model loads.
+    warmup_task = asyncio.create_task(warm_startup_load())
     print(
-        f"[blocking_api] Ready — max_concurrency={MAX_BLOCKING_CONCURRENCY}, "
+        f"[blocking_api] Started — max_concurrency={MAX_BLOCKING_CONCURRENCY}, "
         f"admission_timeout={BLOCKING_ADMISSION_TIMEOUT_MS}ms, "
+        f"max_wait_queue={BLOCKING_MAX_WAIT_QUEUE}, "
         f"deadline={BLOCKING_DEADLINE_SECONDS}s"
     )
     yield
+    warmup_task.cancel()
+
+
+app = FastAPI(
+    title="Cortex-Guard Fixed (Blocking)",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+
+# ── Admission control ───────────────────────────────────────────────────────
 
+async def _admit(timeout: float) -> bool:
+    """Wait up to *timeout* seconds for a free slot; True if admitted."""
+    global _inflight, _waiting
+    _waiting += 1
+    try:
+        async with _cond:
+            try:
+                async with asyncio.timeout(timeout):
+                    await _cond.wait_for(lambda: _inflight < _cmax)
+            except TimeoutError:
+                return False
+            _inflight += 1
+            return True
+    finally:
+        _waiting -= 1
 
-app = FastAPI(title="Cortex-Guard Fixed (Blocking)", lifespan=lifespan)
+
+async def _release() -> None:
+    """Free a slot and wake exactly one waiter."""
+    global _inflight
+    # Decrement before taking the lock: if we are cancelled while waiting for
+    # it, only the wake-up is lost (the next release or timeout recovers),
+    # never the slot itself.
+    _inflight -= 1
+    async with _cond:
+        _cond.notify(1)
 
 
 # ── Endpoints ───────────────────────────────────────────────────────────────
 
 @app.post("/scan/blocking", response_model=BlockingScanResponse)
 async def scan_blocking(req: ScanRequest):
-    request_id = str(uuid.uuid4())
+    request_id = new_request_id()
     started = now_iso()
 
+    # Readiness: fail fast with 503 while the model is still warming
+    if not is_ready():
+        _m[M_REJECTED] += 1
+        raise HTTPException(
+            status_code=503,
+            detail=error_detail(
+                request_id=request_id,
+                error="warming",
+                reason="model_warming",
+                started_at=started,
+                finished_at=now_iso(),
+            ),
+        )
+
+    # Load shedding: every slot is busy and enough requests are already
+    # waiting, so reject immediately instead of after the admission timeout.
+    if _inflight >= _cmax and _waiting >= BLOCKING_MAX_WAIT_QUEUE:
+        _m[M_REJECTED] += 1
+        raise HTTPException(
+            status_code=429,
+            detail=error_detail(
+                request_id=request_id,
+                error="over_capacity",
+                reason="wait_queue_full",
+                started_at=started,
+                finished_at=now_iso(),
+            ),
+        )
+
     # Admission control: try to acquire within a short timeout
     admission_timeout = BLOCKING_ADMISSION_TIMEOUT_MS / 1000.0
-    try:
-        await asyncio.wait_for(_semaphore.acquire(), timeout=admission_timeout)
-    except asyncio.TimeoutError:
-        _metrics["rejected"] += 1
+    if not await _admit(admission_timeout):
+        _m[M_REJECTED] += 1
         raise HTTPException(
             status_code=429,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error="over_capacity",
                 reason="over_capacity",
                 started_at=started,
                 finished_at=now_iso(),
-            ).model_dump(),
+            ),
         )
 
-    _metrics["inflight"] += 1
     try:
         # Scan with a hard deadline
-        with Timer() as t:
-            await asyncio.wait_for(
-                simulate_scan(),
-                timeout=BLOCKING_DEADLINE_SECONDS,
-            )
+        t0 = time.monotonic_ns()
+        async with asyncio.timeout(BLOCKING_DEADLINE_SECONDS):
+            await simulate_scan()
+        scan_ms = (time.monotonic_ns() - t0) * 1e-6
 
         verdict = decide_verdict()
-        _metrics["completed"] += 1
+        _m[M_COMPLETED] += 1
         finished = now_iso()
 
         status_code = 200 if verdict == "allow" else 403
-        response = BlockingScanResponse(
+        response = BlockingScanResponse.model_construct(
             request_id=request_id,
             verdict=ScanVerdict(verdict),
             started_at=started,
             finished_at=finished,
-            scan_duration_ms=round(t.elapsed_ms, 2),
+            scan_duration_ms=round(scan_ms, 2),
             model_mode=os.environ.get("MODEL_MODE", "warm"),
         )
         if verdict == "deny":
@@ -116,45 +191,54 @@ async def scan_blocking(req: ScanRequest):
 
     except HTTPException:
         raise  # re-raise 403
-    except asyncio.TimeoutError:
-        _metrics["rejected"] += 1
+    except TimeoutError:
+        _m[M_REJECTED] += 1
         raise HTTPException(
             status_code=504,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error="deadline_exceeded",
                 reason="scan_deadline_exceeded",
                 started_at=started,
                 finished_at=now_iso(),
-            ).model_dump(),
+            ),
         )
     except Exception as exc:
-        _metrics["errors"] += 1
+        _m[M_ERRORS] += 1
         raise HTTPException(
             status_code=500,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error=str(exc),
                 reason="internal_error",
                 started_at=started,
                 finished_at=now_iso(),
-            ).model_dump(),
+            ),
         )
     finally:
-        _metrics["inflight"] -= 1
-        _semaphore.release()
+        await _release()
 
 
 @app.get("/metrics", response_model=MetricsResponse)
 async def metrics():
     return MetricsResponse(
-        inflight=_metrics["inflight"],
-        completed=_metrics["completed"],
-        rejected=_metrics["rejected"],
-        errors=_metrics["errors"],
+        inflight=_inflight,
+        completed=_m[M_COMPLETED],
+        rejected=_m[M_REJECTED],
+        errors=_m[M_ERRORS],
     )
 
 
+@app.post("/admin/cmax", response_model=CapacityResponse)
+async def set_cmax(req: CapacityRequest):
+    """Resize the admission limit; waiters re-check against the new value."""
+    global _cmax
+    async with _cond:
+        _cmax = req.max_concurrency
+        _cond.notify_all()
+    return CapacityResponse(max_concurrency=_cmax, inflight=_inflight)
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "blocking_fixed"}
+    return {"status": "ok" if is_ready() else "warming", "service": "blocking_fixed"}
@@ -2,6 +2,10 @@
 
 This demonstrates the shared-capacity queueing failure: when blocking requests
 hog the semaphore, nonblocking requests queue behind them and timeout.
+
+Set BASELINE_BLOCKING_POOL > 0 to carve that many slots out of the shared
+capacity into a dedicated blocking pool (in-process bulkhead); nonblocking
+keeps the remainder, so a blocking burst can no longer starve it.
 """
 
 from __future__ import annotations
@@ -9,24 +13,27 @@ from __future__ import annotations
 import asyncio
 import os
 import sys
-import uuid
+import time
+from array import array
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 
 # Ensure common package is importable
 sys.path.insert(0, os.path.dirname(__file__))
 
+from common.ids import new_request_id
 from common.models import (
     BlockingScanResponse,
-    ErrorResponse,
-    MetricsResponse,
+    CombinedMetricsResponse,
     ScanRequest,
     ScanVerdict,
+    error_detail,
 )
 from common.simulate import (
-    Timer,
     decide_verdict,
+    is_ready,
     now_iso,
     simulate_scan,
     warm_startup_load,
@@ -36,111 +43,162 @@ from common.simulate import (
 
 BASELINE_SHARED_CONCURRENCY = int(os.environ.get("BASELINE_SHARED_CONCURRENCY", "24"))
 BASELINE_REQUEST_DEADLINE_S = float(os.environ.get("BASELINE_REQUEST_DEADLINE_S", "5"))
+BASELINE_BLOCKING_POOL = int(os.environ.get("BASELINE_BLOCKING_POOL", "0"))  # 0 = shared
 
 # ── Shared state ────────────────────────────────────────────────────────────
 
-_semaphore: asyncio.Semaphore
-_metrics = {
-    "inflight": 0,
-    "completed": 0,
-    "rejected": 0,
-    "errors": 0,
+_sem_blocking: asyncio.Semaphore
+_sem_nonblocking: asyncio.Semaphore  # same object as _sem_blocking when shared
+
+# Hot counters live in fixed int64 arrays indexed by these constants.
+M_INFLIGHT, M_COMPLETED, M_REJECTED, M_ERRORS = 0, 1, 2, 3
+P_SIZE, P_INFLIGHT, P_REJECTED = 0, 1, 2
+_m = array("q", [0] * 4)
+_pool_m = {
+    "blocking": array("q", [0] * 3),
+    "nonblocking": array("q", [0] * 3),
 }
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _semaphore
-    _semaphore = asyncio.Semaphore(BASELINE_SHARED_CONCURRENCY)
-    await warm_startup_load()
+    global _sem_blocking, _sem_nonblocking
+    if BASELINE_BLOCKING_POOL > 0:
+        if BASELINE_BLOCKING_POOL >= BASELINE_SHARED_CONCURRENCY:
+            raise ValueError(
+                "BASELINE_BLOCKING_POOL must be smaller than BASELINE_SHARED_CONCURRENCY"
+            )
+        n_blk = BASELINE_BLOCKING_POOL
+        n_nb = BASELINE_SHARED_CONCURRENCY - n_blk
+        _sem_blocking = asyncio.Semaphore(n_blk)
+        _sem_nonblocking = asyncio.Semaphore(n_nb)
+        layout = f"isolated pools blocking={n_blk}, nonblocking={n_nb}"
+    else:
+        n_blk = n_nb = BASELINE_SHARED_CONCURRENCY
+        _sem_blocking = _sem_nonblocking = asyncio.Semaphore(BASELINE_SHARED_CONCURRENCY)
+        layout = f"shared concurrency={BASELINE_SHARED_CONCURRENCY}"
+    _pool_m["blocking"][P_SIZE] = n_blk
+    _pool_m["nonblocking"][P_SIZE] = n_nb
+    # Warm up in the background so /health answers (and scans get a clean
+    # 503) while the model loads.
+    warmup_task = asyncio.create_task(warm_startup_load())
     print(
-        f"[combined_api] Ready — shared concurrency={BASELINE_SHARED_CONCURRENCY}, "
+        f"[combined_api] Started — {layout}, "
         f"deadline={BASELINE_REQUEST_DEADLINE_S}s"
     )
     yield
+    warmup_task.cancel()
 
 
-app = FastAPI(title="Cortex-Guard Baseline (Combined)", lifespan=lifespan)
+app = FastAPI(
+    title="Cortex-Guard Baseline (Combined)",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 # ── Helpers ─────────────────────────────────────────────────────────────────
 
-async def _acquire_or_timeout(deadline: float) -> bool:
-    """Try to acquire the shared semaphore within *deadline* seconds."""
+async def _acquire_or_timeout(sem: asyncio.Semaphore, deadline: float) -> bool:
+    """Try to acquire *sem* within *deadline* seconds."""
     try:
-        await asyncio.wait_for(_semaphore.acquire(), timeout=deadline)
+        async with asyncio.timeout(deadline):
+            await sem.acquire()
         return True
-    except asyncio.TimeoutError:
+    except TimeoutError:
         return False
 
 
-async def _do_scan(request_id: str, content: str, endpoint: str):
-    """Shared scan path used by BOTH endpoints — the root cause of the problem."""
+async def _do_scan(
+    request_id: str, content: str, endpoint: str, sem: asyncio.Semaphore
+):
+    """Scan path used by BOTH endpoints.
+
+    With the default shared *sem* this is the root cause of the problem.
+    """
     started = now_iso()
+    pool = _pool_m[endpoint]
 
-    # Try to acquire shared capacity within the deadline
-    acquired = await _acquire_or_timeout(BASELINE_REQUEST_DEADLINE_S)
+    # Readiness: fail fast with 503 while the model is still warming
+    if not is_ready():
+        _m[M_REJECTED] += 1
+        raise HTTPException(
+            status_code=503,
+            detail=error_detail(
+                request_id=request_id,
+                error="warming",
+                reason="model_warming",
+                started_at=started,
+                finished_at=now_iso(),
+            ),
+        )
+
+    # Try to acquire capacity within the deadline
+    acquired = await _acquire_or_timeout(sem, BASELINE_REQUEST_DEADLINE_S)
     if not acquired:
-        _metrics["rejected"] += 1
+        _m[M_REJECTED] += 1
+        pool[P_REJECTED] += 1
         finished = now_iso()
         raise HTTPException(
             status_code=504,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error="timeout",
                 reason="shared_capacity_exhausted",
                 started_at=started,
                 finished_at=finished,
-            ).model_dump(),
+            ),
         )
 
-    _metrics["inflight"] += 1
+    _m[M_INFLIGHT] += 1
+    pool[P_INFLIGHT] += 1
     try:
-        with Timer() as t:
-            scan_seconds = await asyncio.wait_for(
-                simulate_scan(),
-                timeout=BASELINE_REQUEST_DEADLINE_S,
-            )
+        t0 = time.monotonic_ns()
+        async with asyncio.timeout(BASELINE_REQUEST_DEADLINE_S):
+            await simulate_scan()
+        scan_ms = (time.monotonic_ns() - t0) * 1e-6
         verdict = decide_verdict()
-        _metrics["completed"] += 1
+        _m[M_COMPLETED] += 1
         finished = now_iso()
-        return BlockingScanResponse(
+        return BlockingScanResponse.model_construct(
             request_id=request_id,
             verdict=ScanVerdict(verdict),
             started_at=started,
             finished_at=finished,
-            scan_duration_ms=t.elapsed_ms,
+            scan_duration_ms=scan_ms,
             model_mode=os.environ.get("MODEL_MODE", "warm"),
         )
-    except asyncio.TimeoutError:
-        _metrics["rejected"] += 1
+    except TimeoutError:
+        _m[M_REJECTED] += 1
+        pool[P_REJECTED] += 1
         finished = now_iso()
         raise HTTPException(
             status_code=504,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error="timeout",
                 reason="scan_deadline_exceeded",
                 started_at=started,
                 finished_at=finished,
-            ).model_dump(),
+            ),
         )
     except Exception as exc:
-        _metrics["errors"] += 1
+        _m[M_ERRORS] += 1
         finished = now_iso()
         raise HTTPException(
             status_code=500,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error=str(exc),
                 reason="internal_error",
                 started_at=started,
                 finished_at=finished,
-            ).model_dump(),
+            ),
         )
     finally:
-        _metrics["inflight"] -= 1
-        _semaphore.release()
+        _m[M_INFLIGHT] -= 1
+        pool[P_INFLIGHT] -= 1
+        sem.release()
 
 
 # ── Endpoints ───────────────────────────────────────────────────────────────
@@ -148,26 +206,46 @@ async def _do_scan(request_id: str, content: str, endpoint: str):
 @app.post("/scan/nonblocking", response_model=BlockingScanResponse)
 async def scan_nonblocking(req: ScanRequest):
     """In baseline, nonblocking goes through the SAME shared capacity — bad."""
-    request_id = str(uuid.uuid4())
-    return await _do_scan(request_id, req.content, "nonblocking")
+    request_id = new_request_id()
+    return await _do_scan(request_id, req.content, "nonblocking", _sem_nonblocking)
 
 
 @app.post("/scan/blocking", response_model=BlockingScanResponse)
 async def scan_blocking(req: ScanRequest):
-    request_id = str(uuid.uuid4())
-    return await _do_scan(request_id, req.content, "blocking")
+    request_id = new_request_id()
+    return await _do_scan(request_id, req.content, "blocking", _sem_blocking)
 
 
-@app.get("/metrics", response_model=MetricsResponse)
+@app.get("/metrics", response_model=CombinedMetricsResponse)
 async def metrics():
-    return MetricsResponse(
-        inflight=_metrics["inflight"],
-        completed=_metrics["completed"],
-        rejected=_metrics["rejected"],
-        errors=_metrics["errors"],
+    if _sem_blocking is _sem_nonblocking:
+        # One semaphore serves both endpoints: report it once, not twice.
+        blk, nb = _pool_m["blocking"], _pool_m["nonblocking"]
+        pools = {
+            "shared": {
+                "size": BASELINE_SHARED_CONCURRENCY,
+                "inflight": blk[P_INFLIGHT] + nb[P_INFLIGHT],
+                "rejected": blk[P_REJECTED] + nb[P_REJECTED],
+            }
+        }
+    else:
+        pools = {
+            name: {
+                "size": pool[P_SIZE],
+                "inflight": pool[P_INFLIGHT],
+                "rejected": pool[P_REJECTED],
+            }
+            for name, pool in _pool_m.items()
+        }
+    return CombinedMetricsResponse(
+        inflight=_m[M_INFLIGHT],
+        completed=_m[M_COMPLETED],
+        rejected=_m[M_REJECTED],
+        errors=_m[M_ERRORS],
+        pools=pools,
     )
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "combined_baseline"}
+    return {"status": "ok" if is_ready() else "warming", "service": "combined_baseline"}
@@ -0,0 +1,42 @@
+"""Request-ID generation from a pre-generated pool, refilled in batches."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import deque
+
+_POOL_LOW_WATER = 256
+_POOL_BATCH = 1024
+
+_rid_pool: deque[str] = deque()
+_refill_scheduled = False
+
+
+def _refill() -> None:
+    """Add _POOL_BATCH random 128-bit hex IDs from a single urandom call."""
+    global _refill_scheduled
+    _refill_scheduled = False
+    buf = os.urandom(16 * _POOL_BATCH).hex()
+    _rid_pool.extend(buf[i:i + 32] for i in range(0, len(buf), 32))
+
+
+def new_request_id() -> str:
+    """Pop a pre-generated 32-char hex ID, topping the pool up when low.
+
+    The refill runs as a loop callback after the current request rather than
+    on a timer, so an idle service does no work at all.
+    """
+    global _refill_scheduled
+    if len(_rid_pool) < _POOL_LOW_WATER and not _refill_scheduled:
+        try:
+            asyncio.get_running_loop().call_soon(_refill)
+            _refill_scheduled = True
+        except RuntimeError:  # no running loop: refill inline
+            _refill()
+    if _rid_pool:
+        return _rid_pool.popleft()
+    return os.urandom(16).hex()
+
+
+_refill()
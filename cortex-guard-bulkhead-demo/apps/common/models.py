@@ -15,6 +15,10 @@ class ScanRequest(BaseModel):
     metadata: Optional[dict] = Field(default=None, description="Optional metadata")
 
 
+class CapacityRequest(BaseModel):
+    max_concurrency: int = Field(..., ge=1, description="New admission limit (C_max)")
+
+
 # ── Enums ───────────────────────────────────────────────────────────────────
 
 class ScanVerdict(str, Enum):
@@ -66,6 +70,27 @@ class ErrorResponse(BaseModel):
     finished_at: str
 
 
+def error_detail(
+    *, request_id: str, error: str, reason: str, started_at: str, finished_at: str
+) -> dict:
+    """Same shape as ``ErrorResponse(...).model_dump()``, minus validation.
+
+    Used on overload/error paths, where every field is a trusted server string.
+    """
+    return {
+        "request_id": request_id,
+        "error": error,
+        "reason": reason,
+        "started_at": started_at,
+        "finished_at": finished_at,
+    }
+
+
+class CapacityResponse(BaseModel):
+    max_concurrency: int
+    inflight: int
+
+
 class MetricsResponse(BaseModel):
     """Generic metrics envelope — each app adds its own fields."""
     inflight: int = 0
@@ -75,3 +100,8 @@ class MetricsResponse(BaseModel):
     queue_depth: int = 0
     processed_jobs: int = 0
     avg_processing_ms: float = 0.0
+
+
+class CombinedMetricsResponse(MetricsResponse):
+    """Baseline metrics plus per-pool capacity (one "shared" pool by default)."""
+    pools: dict[str, dict[str, int]] = Field(default_factory=dict)
@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
 import os
 import random
 import time
+from array import array
 
 # ── Seeded RNG ──────────────────────────────────────────────────────────────
 
@@ -29,6 +31,21 @@ MODEL_MODE = os.environ.get("MODEL_MODE", "warm")  # "cold" or "warm"
 RANDOM_VIOLATION_RATE = float(os.environ.get("RANDOM_VIOLATION_RATE", "0.02"))
 
 
+# ── Pre-generated draws ─────────────────────────────────────────────────────
+# Warm-scan delays and verdict draws are generated once from the seeded RNG
+# and then read round-robin, so the per-request path is an index, not an RNG
+# call.
+
+_TABLE_SIZE = 1 << 16
+_TABLE_MASK = _TABLE_SIZE - 1
+_warm_delays_ms = array(
+    "d", (_rng.uniform(WARM_SCAN_MIN_MS, WARM_SCAN_MAX_MS) for _ in range(_TABLE_SIZE))
+)
+_verdict_draws = array("d", (_rng.random() for _ in range(_TABLE_SIZE)))
+_delay_idx = itertools.count()
+_verdict_idx = itertools.count()
+
+
 # ── Simulated model state ──────────────────────────────────────────────────
 
 _model_loaded = False
@@ -44,53 +61,46 @@ async def warm_startup_load() -> None:
         print("[simulate] Model loaded and warm.")
 
 
+def is_ready() -> bool:
+    """True once the service can scan (always in cold mode)."""
+    return MODEL_MODE != "warm" or _model_loaded
+
+
 async def simulate_scan() -> float:
     """Simulate scan work. Returns wall-clock seconds spent scanning.
 
     Cold mode: each call pays full model-load + scan latency.
     Warm mode: fast jittered scan only (model already loaded at startup).
     """
-    rng = get_rng()
-
     if MODEL_MODE == "cold":
-        delay = rng.uniform(COLD_LOAD_MIN_S, COLD_LOAD_MAX_S)
+        delay = get_rng().uniform(COLD_LOAD_MIN_S, COLD_LOAD_MAX_S)
         await asyncio.sleep(delay)
         return delay
 
     # warm: fast scan
-    delay_ms = rng.uniform(WARM_SCAN_MIN_MS, WARM_SCAN_MAX_MS)
+    delay_ms = _warm_delays_ms[next(_delay_idx) & _TABLE_MASK]
     await asyncio.sleep(delay_ms / 1000.0)
     return delay_ms / 1000.0
 
 
 def decide_verdict() -> str:
     """Return 'allow' or 'deny' based on RANDOM_VIOLATION_RATE."""
-    if get_rng().random() < RANDOM_VIOLATION_RATE:
+    if _verdict_draws[next(_verdict_idx) & _TABLE_MASK] < RANDOM_VIOLATION_RATE:
         return "deny"
     return "allow"
 
 
 # ── Timing helpers ──────────────────────────────────────────────────────────
 
-def now_iso() -> str:
-    """ISO-8601 UTC timestamp string."""
-    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
-
-
-class Timer:
-    """Simple wall-clock context-manager timer."""
+# [formatted string, epoch second it was formatted for]
+_iso_cache: list = ["", -1]
 
-    def __init__(self) -> None:
-        self.start: float = 0
-        self.end: float = 0
 
-    def __enter__(self) -> "Timer":
-        self.start = time.monotonic()
-        return self
-
-    def __exit__(self, *_: object) -> None:
-        self.end = time.monotonic()
+def now_iso() -> str:
+    """ISO-8601 UTC timestamp string (second resolution, cached per second)."""
+    sec = int(time.time())
+    if sec != _iso_cache[1]:
+        _iso_cache[0] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(sec))
+        _iso_cache[1] = sec
+    return _iso_cache[0]
 
-    @property
-    def elapsed_ms(self) -> float:
-        return (self.end - self.start) * 1000.0
@@ -1,17 +1,30 @@
-"""In-memory result store with TTL-based cleanup (no external DB)."""
+"""In-memory result store with TTL-based cleanup and a size cap (no external DB)."""
 
 from __future__ import annotations
 
 import asyncio
 import os
 import time
-from dataclasses import dataclass, field
-from typing import Optional
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
 
 RESULT_TTL_SECONDS = int(os.environ.get("RESULT_TTL_SECONDS", "86400"))
+MAX_RECORDS = int(os.environ.get("MAX_RECORDS", "1000000"))
 
 
-@dataclass
+class JobSnapshot(NamedTuple):
+    """Immutable view of a job, as served to status polls."""
+    request_id: str
+    status: str
+    verdict: Optional[str]
+    enqueued_at: Optional[str]
+    started_at: Optional[str]
+    finished_at: Optional[str]
+    scan_duration_ms: Optional[float]
+
+
+@dataclass(slots=True)
 class JobRecord:
     request_id: str
     status: str = "pending"           # pending | processing | done | violation | error
@@ -20,38 +33,93 @@ class JobRecord:
     started_at: Optional[str] = None
     finished_at: Optional[str] = None
     scan_duration_ms: Optional[float] = None
-    _created_ts: float = field(default_factory=time.monotonic)
+
+    def snapshot(self) -> JobSnapshot:
+        return JobSnapshot(
+            self.request_id,
+            self.status,
+            self.verdict,
+            self.enqueued_at,
+            self.started_at,
+            self.finished_at,
+            self.scan_duration_ms,
+        )
 
 
 class ResultStore:
-    """Thread-safe-ish (single event loop) in-memory store."""
+    """Thread-safe-ish (single event loop) in-memory store.
+
+    Live jobs are mutable JobRecords in ``_data``; once a worker calls
+    ``finish()`` they move to ``_done`` as read-only JobSnapshots, so status
+    polls for finished jobs never touch the records workers are writing.
+
+    Finished snapshots are capped at MAX_RECORDS; past that the oldest is
+    evicted, so memory stays bounded even when the TTL is long.
+    """
 
     def __init__(self) -> None:
         self._data: dict[str, JobRecord] = {}
+        self._done: OrderedDict[str, JobSnapshot] = OrderedDict()
+        # (expire_ts, request_id) in insertion order. The TTL is constant, so
+        # this is also expiry order and cleanup only ever pops from the left.
+        # Bounded like _done: an entry only falls off the left after
+        # MAX_RECORDS newer puts, by which point the size cap has evicted (or
+        # soon will evict) its record.
+        self._expiry: deque[tuple[float, str]] = deque(maxlen=MAX_RECORDS)
 
     def put(self, record: JobRecord) -> None:
         self._data[record.request_id] = record
+        self._expiry.append((time.monotonic() + RESULT_TTL_SECONDS, record.request_id))
 
     def get(self, request_id: str) -> Optional[JobRecord]:
+        """Return the live (not yet finished) record for *request_id*."""
         return self._data.get(request_id)
 
+    def finish(self, record: JobRecord) -> None:
+        """Freeze a finished record into a snapshot and drop the live copy.
+
+        A record already evicted by TTL cleanup while it was processing is
+        dropped, not resurrected: it has no expiry entry left to remove it.
+        """
+        if self._data.pop(record.request_id, None) is None:
+            return
+        self._done[record.request_id] = record.snapshot()
+        if len(self._done) > MAX_RECORDS:
+            self._done.popitem(last=False)
+
+    def snapshot(self, request_id: str) -> Optional[JobSnapshot]:
+        """Return the job's current state, checking finished jobs first."""
+        snap = self._done.get(request_id)
+        if snap is not None:
+            return snap
+        record = self._data.get(request_id)
+        return record.snapshot() if record is not None else None
+
     def remove(self, request_id: str) -> None:
         self._data.pop(request_id, None)
+        self._done.pop(request_id, None)
 
     @property
     def size(self) -> int:
-        return len(self._data)
+        return len(self._data) + len(self._done)
+
+    async def ttl_cleanup_loop(self, interval: float = 1.0) -> None:
+        """Periodically evict records older than RESULT_TTL_SECONDS.
 
-    async def ttl_cleanup_loop(self, interval: float = 60.0) -> None:
-        """Periodically evict records older than RESULT_TTL_SECONDS."""
+        Work is proportional to the number of expired records; live ones are
+        never visited.
+        """
+        expiry = self._expiry
         while True:
             await asyncio.sleep(interval)
             now = time.monotonic()
-            expired = [
-                rid for rid, rec in self._data.items()
-                if (now - rec._created_ts) > RESULT_TTL_SECONDS
-            ]
-            for rid in expired:
-                self._data.pop(rid, None)
-            if expired:
-                print(f"[state] TTL cleanup: evicted {len(expired)} records")
+            evicted = 0
+            while expiry and expiry[0][0] <= now:
+                _, rid = expiry.popleft()
+                if (
+                    self._done.pop(rid, None) is not None
+                    or self._data.pop(rid, None) is not None
+                ):
+                    evicted += 1
+            if evicted:
+                print(f"[state] TTL cleanup: evicted {evicted} records")
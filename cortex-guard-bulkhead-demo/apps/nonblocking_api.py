@@ -10,25 +10,29 @@ from __future__ import annotations
 import asyncio
 import os
 import sys
-import uuid
+import time
+from array import array
+from collections import deque
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 
 sys.path.insert(0, os.path.dirname(__file__))
 
+from common.ids import new_request_id
 from common.models import (
-    ErrorResponse,
     JobStatus,
     MetricsResponse,
     NonblockingAcceptResponse,
     NonblockingStatusResponse,
     ScanRequest,
     ScanVerdict,
+    error_detail,
 )
 from common.simulate import (
-    Timer,
     decide_verdict,
+    is_ready,
     now_iso,
     simulate_scan,
     warm_startup_load,
@@ -43,64 +47,75 @@ MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", "2000"))
 # ── State ───────────────────────────────────────────────────────────────────
 
 _store = ResultStore()
-_queue: asyncio.Queue
-_metrics = {
-    "completed": 0,
-    "rejected": 0,
-    "errors": 0,
-    "total_processing_ms": 0.0,
-    "processed_jobs": 0,
-}
+# Job queue: a plain deque bounded by MAX_QUEUE_DEPTH at submit time, plus an
+# Event that idle workers park on until new work arrives.
+_q: deque[str] = deque()
+_have_work: asyncio.Event
+
+# Hot counters live in fixed arrays indexed by these constants.
+M_COMPLETED, M_REJECTED, M_ERRORS, M_PROCESSED = 0, 1, 2, 3
+_m = array("q", [0] * 4)
+_processing_ms = array("d", [0.0])  # cumulative scan time of processed jobs
+
 _worker_tasks: list[asyncio.Task] = []
 
 
 # ── Background worker ──────────────────────────────────────────────────────
 
+async def _process(worker_id: int, request_id: str) -> None:
+    """Run one scan job and record its outcome."""
+    record = _store.get(request_id)
+    if record is None:
+        return
+
+    record.status = "processing"
+    record.started_at = now_iso()
+    try:
+        t0 = time.monotonic_ns()
+        await simulate_scan()
+        scan_ms = (time.monotonic_ns() - t0) * 1e-6
+        verdict = decide_verdict()
+        record.verdict = verdict
+        record.status = "violation" if verdict == "deny" else "done"
+        record.finished_at = now_iso()
+        record.scan_duration_ms = scan_ms
+        _m[M_COMPLETED] += 1
+        _m[M_PROCESSED] += 1
+        _processing_ms[0] += scan_ms
+    except Exception as exc:
+        record.status = "error"
+        record.finished_at = now_iso()
+        _m[M_ERRORS] += 1
+        print(f"[worker-{worker_id}] Error processing {request_id}: {exc}")
+    finally:
+        _store.finish(record)
+
+
 async def _worker(worker_id: int) -> None:
     """Drain the queue and process scan jobs."""
     while True:
-        request_id: str = await _queue.get()
-        record = _store.get(request_id)
-        if record is None:
-            _queue.task_done()
-            continue
-
-        record.status = "processing"
-        record.started_at = now_iso()
-        try:
-            with Timer() as t:
-                await simulate_scan()
-            verdict = decide_verdict()
-            record.verdict = verdict
-            record.status = "violation" if verdict == "deny" else "done"
-            record.finished_at = now_iso()
-            record.scan_duration_ms = t.elapsed_ms
-            _metrics["completed"] += 1
-            _metrics["processed_jobs"] += 1
-            _metrics["total_processing_ms"] += t.elapsed_ms
-        except Exception as exc:
-            record.status = "error"
-            record.finished_at = now_iso()
-            _metrics["errors"] += 1
-            print(f"[worker-{worker_id}] Error processing {request_id}: {exc}")
-        finally:
-            _queue.task_done()
+        while not _q:
+            _have_work.clear()
+            await _have_work.wait()
+        await _process(worker_id, _q.popleft())
 
 
 # ── Lifespan ────────────────────────────────────────────────────────────────
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _queue
-    _queue = asyncio.Queue(maxsize=MAX_QUEUE_DEPTH)
-    await warm_startup_load()
+    global _have_work
+    _have_work = asyncio.Event()
+    # Warm up in the background so /health answers (and scans get a clean
+    # 503) while the model loads.
+    warmup_task = asyncio.create_task(warm_startup_load())
 
     # Start background workers
     for i in range(NONBLOCKING_WORKERS):
         task = asyncio.create_task(_worker(i))
         _worker_tasks.append(task)
     print(
-        f"[nonblocking_api] Ready — workers={NONBLOCKING_WORKERS}, "
+        f"[nonblocking_api] Started — workers={NONBLOCKING_WORKERS}, "
         f"max_queue={MAX_QUEUE_DEPTH}"
     )
 
@@ -110,92 +125,105 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
+    warmup_task.cancel()
     cleanup_task.cancel()
     for task in _worker_tasks:
         task.cancel()
 
 
-app = FastAPI(title="Cortex-Guard Fixed (Nonblocking)", lifespan=lifespan)
+app = FastAPI(
+    title="Cortex-Guard Fixed (Nonblocking)",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 # ── Endpoints ───────────────────────────────────────────────────────────────
 
 @app.post("/scan/nonblocking", response_model=NonblockingAcceptResponse, status_code=202)
 async def scan_nonblocking(req: ScanRequest):
-    request_id = str(uuid.uuid4())
+    request_id = new_request_id()
     started = now_iso()
 
-    # Backpressure: reject if queue is full
-    if _queue.qsize() >= MAX_QUEUE_DEPTH:
-        _metrics["rejected"] += 1
+    # Readiness: fail fast with 503 while the model is still warming
+    if not is_ready():
+        _m[M_REJECTED] += 1
         raise HTTPException(
             status_code=503,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
-                error="queue_full",
-                reason="queue_full",
+                error="warming",
+                reason="model_warming",
                 started_at=started,
                 finished_at=now_iso(),
-            ).model_dump(),
+            ),
         )
 
-    record = JobRecord(request_id=request_id, status="pending", enqueued_at=started)
-    _store.put(record)
-
-    try:
-        _queue.put_nowait(request_id)
-    except asyncio.QueueFull:
-        _store.remove(request_id)
-        _metrics["rejected"] += 1
+    # Backpressure: reject if queue is full
+    if len(_q) >= MAX_QUEUE_DEPTH:
+        _m[M_REJECTED] += 1
         raise HTTPException(
             status_code=503,
-            detail=ErrorResponse(
+            detail=error_detail(
                 request_id=request_id,
                 error="queue_full",
                 reason="queue_full",
                 started_at=started,
                 finished_at=now_iso(),
-            ).model_dump(),
+            ),
         )
 
-    return NonblockingAcceptResponse(
-        request_id=request_id,
-        started_at=started,
+    record = JobRecord(request_id=request_id, status="pending", enqueued_at=started)
+    _store.put(record)
+    _q.append(request_id)
+    _have_work.set()
+
+    # Hottest path: fixed-shape body, serialized straight to JSON without a
+    # Pydantic round-trip (the response_model above still documents it).
+    return ORJSONResponse(
+        {
+            "request_id": request_id,
+            "status": "accepted",
+            "started_at": started,
+            "message": "Job enqueued for scanning",
+        },
+        status_code=202,
     )
 
 
 @app.get("/scan/status/{request_id}", response_model=NonblockingStatusResponse)
 async def scan_status(request_id: str):
-    record = _store.get(request_id)
-    if record is None:
+    snap = _store.snapshot(request_id)
+    if snap is None:
         raise HTTPException(status_code=404, detail="request_id not found")
 
     return NonblockingStatusResponse(
-        request_id=record.request_id,
-        status=JobStatus(record.status),
-        verdict=ScanVerdict(record.verdict) if record.verdict else None,
-        enqueued_at=record.enqueued_at,
-        started_at=record.started_at,
-        finished_at=record.finished_at,
-        scan_duration_ms=record.scan_duration_ms,
+        request_id=snap.request_id,
+        status=JobStatus(snap.status),
+        verdict=ScanVerdict(snap.verdict) if snap.verdict else None,
+        enqueued_at=snap.enqueued_at,
+        started_at=snap.started_at,
+        finished_at=snap.finished_at,
+        scan_duration_ms=snap.scan_duration_ms,
     )
 
 
 @app.get("/metrics", response_model=MetricsResponse)
 async def metrics():
     avg = 0.0
-    if _metrics["processed_jobs"] > 0:
-        avg = _metrics["total_processing_ms"] / _metrics["processed_jobs"]
+    processed = _m[M_PROCESSED]
+    if processed > 0:
+        avg = _processing_ms[0] / processed
     return MetricsResponse(
-        queue_depth=_queue.qsize(),
-        completed=_metrics["completed"],
-        rejected=_metrics["rejected"],
-        errors=_metrics["errors"],
-        processed_jobs=_metrics["processed_jobs"],
+        queue_depth=len(_q),
+        completed=_m[M_COMPLETED],
+        rejected=_m[M_REJECTED],
+        errors=_m[M_ERRORS],
+        processed_jobs=processed,
         avg_processing_ms=round(avg, 2),
     )
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "nonblocking_fixed"}
+    return {"status": "ok" if is_ready() else "warming", "service": "nonblocking_fixed"}
@@ -6,37 +6,170 @@ Use TARGET_HOST env var to point at either service:
 
 This is a BLOCKING-ONLY test to reproduce the "200 blocking calls in 2 seconds"
 burst scenario described in the problem statement.
+
+LOAD_MODE selects how each user paces itself:
+  LOAD_MODE=spike       (default) each user starts a request every PACING_S
+                        seconds (default 0.01, ~100 req/s per user). The burst
+                        comes from the shape ramping the user count, not from
+                        zero-wait spinning, so spawn rate no longer skews latency
+  LOAD_MODE=throughput  each user sends RPS_PER_USER requests/s, so offered
+                        load is fixed and p99 reflects the server, not the
+                        client (avoids coordinated omission)
+
+  LOAD_MODE=throughput RPS_PER_USER=2 TARGET_HOST=http://localhost:8002 \
+    locust -f locustfile_spike.py --headless
+
+SPIKE_BATCH=N (default 1) makes each task iteration fire N concurrent requests
+via gevent, amortizing one pass through Locust's task loop over N requests.
+Keep N <= the user's connection concurrency or the extras just queue.
+
+In distributed runs each worker opens its own sockets, so pin the socket
+budget: CONN_PER_USER (default 10) caps connections per user, and FIXED_USERS
+sets Locust's fixed_count. fixed_count is a TOTAL across all workers (Locust
+spreads it between them), not a per-worker count — FIXED_USERS=400 with 4
+workers gives 100 users each, at most 400 * CONN_PER_USER sockets overall.
+
+CLIENT_TIMEOUT (default 5) sets the connect/read timeout in seconds. The user
+loop is pure Python, so running Locust under PyPy speeds up the client side.
+
+One Locust process drives every user from a single core and saturates it
+before the server does at 400 users. Fork one worker per core instead (each
+gets its own gevent hub and connection pool):
+  locust --processes -1 -f locustfile_spike.py --headless
 """
 
+import logging
 import os
 
-from locust import HttpUser, LoadTestShape, constant, task
+import gevent
+from gevent.pool import Group
+from geventhttpclient.useragent import ConnectionError as HTTPClientError
+from locust import LoadTestShape, constant_pacing, constant_throughput, task
+from locust.contrib.fasthttp import FastHttpUser
 
-SCAN_PAYLOAD = {"content": "Scan this content for compliance violations immediately."}
+# Pre-encoded JSON: the payload never changes, so nothing serializes it.
+SCAN_PAYLOAD = b'{"content":"Scan this content for compliance violations immediately."}'
 TARGET_HOST = os.environ.get("TARGET_HOST", "http://localhost:8000")
-CLIENT_TIMEOUT = 5
+CLIENT_TIMEOUT = float(os.environ.get("CLIENT_TIMEOUT", "5"))
+LOAD_MODE = os.environ.get("LOAD_MODE", "spike")  # "spike" or "throughput"
+RPS_PER_USER = float(os.environ.get("RPS_PER_USER", "1"))
+PACING_S = float(os.environ.get("PACING_S", "0.01"))
+SPIKE_BATCH = int(os.environ.get("SPIKE_BATCH", "1"))
+FIXED_USERS = int(os.environ.get("FIXED_USERS", "0"))  # 0 = not pinned
+CONN_PER_USER = int(os.environ.get("CONN_PER_USER", "10"))
+
+# 400 users x CONN_PER_USER sockets overruns the common 1024 fd soft limit,
+# and the test would then measure EMFILE instead of the bulkhead. Raise the
+# soft limit as far as the hard limit allows; best-effort, non-Unix skips it.
+try:
+    import resource
+
+    _soft, _hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    _want = 65536 if _hard == resource.RLIM_INFINITY else min(65536, _hard)
+    if _soft != resource.RLIM_INFINITY and _soft < _want:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (_want, _hard))
+except (ImportError, ValueError, OSError):
+    pass
 
+log = logging.getLogger(__name__)
 
-class SpikeBlockingUser(HttpUser):
-    """Sends only blocking scan requests — pure blocking burst."""
+_HEADERS = {
+    "Content-Type": "application/json",
+    "Content-Length": str(len(SCAN_PAYLOAD)),
+}
+# Shed / timed-out statuses the bulkhead is expected to return under load.
+_EXPECTED_FAIL = frozenset((429, 503, 504))
+# Their failure messages, built once so the failure path is a dict lookup.
+_FAIL_MSG = {code: f"Rejected/timeout: {code}" for code in _EXPECTED_FAIL}
+
+
+class SpikeBlockingUser(FastHttpUser):
+    """Sends only blocking scan requests — pure blocking burst.
+
+    Uses FastHttpUser (geventhttpclient) rather than HttpUser (requests) so the
+    load generator's own per-request CPU does not cap the burst or inflate the
+    measured latencies.
+    """
     host = TARGET_HOST
-    wait_time = constant(0)  # fire as fast as possible
+    if LOAD_MODE == "throughput":
+        wait_time = constant_throughput(RPS_PER_USER)
+    else:
+        wait_time = constant_pacing(PACING_S)
+    network_timeout = CLIENT_TIMEOUT
+    connection_timeout = CLIENT_TIMEOUT
+    concurrency = CONN_PER_USER  # max concurrent connections per user
+    fixed_count = FIXED_USERS
+
+    def on_start(self):
+        # Open the keep-alive connection before the first timed request so
+        # the TCP handshake does not land in the spike measurements. This goes
+        # through the raw geventhttpclient agent, which fires no request event,
+        # so warm-up calls stay out of the stats and percentile histograms.
+        # Stats are not cleared instead: other users are already mid-run.
+        try:
+            resp = self.client.client.urlopen(self.host + "/health", method="GET")
+            # Read the body so the keep-alive connection goes back to the pool.
+            _ = resp.content
+        except (OSError, gevent.Timeout, HTTPClientError) as exc:
+            # Not fatal (the first scan opens the connection instead), but a
+            # wrong TARGET_HOST or a down server should be visible.
+            log.warning("warm-up GET %s/health failed: %r", self.host, exc)
+        # Bound once per user so each scan skips the self.client lookup.
+        self._post = self.client.post
 
     @task
     def scan_blocking(self):
-        with self.client.post(
-            "/scan/blocking",
-            json=SCAN_PAYLOAD,
-            timeout=CLIENT_TIMEOUT,
+        if SPIKE_BATCH <= 1:
+            self._scan_once()
+            return
+        # Each request is bounded by its own connect/read timeouts, so wait for
+        # the whole batch: in-flight requests never exceed SPIKE_BATCH. Kill
+        # on exit so a user stopped mid-batch (scale-down, shutdown) takes its
+        # requests with it.
+        group = Group()
+        for _ in range(SPIKE_BATCH):
+            group.spawn(self._scan_once)
+        try:
+            group.join()
+        finally:
+            group.kill()
+
+    def _scan_once(
+        self,
+        # Bound once at definition time so the hot loop reads fast locals
+        # instead of module globals. Always called with no arguments.
+        _url="/scan/blocking",
+        _body=SCAN_PAYLOAD,
+        _headers=_HEADERS,
+        _name="/scan/blocking (spike)",
+    ):
+        with self._post(
+            _url,
+            data=_body,
+            headers=_headers,
             catch_response=True,
-            name="/scan/blocking (spike)",
+            name=_name,
         ) as resp:
-            if resp.status_code in (200, 403):
+            # 200 needs no call: the context manager reports it as a success
+            # on exit. Only statuses whose default outcome is wrong (403 is a
+            # valid "deny" verdict) or whose message matters are marked here.
+            sc = resp.status_code
+            if sc == 200:
+                return
+            if sc == 403:
                 resp.success()
-            elif resp.status_code in (429, 503, 504):
-                resp.failure(f"Rejected/timeout: {resp.status_code}")
+            elif sc in _EXPECTED_FAIL:
+                resp.failure(_FAIL_MSG[sc])
             else:
-                resp.failure(f"Unexpected: {resp.status_code}")
+                resp.failure(f"Unexpected: {sc}")
+
+
+def _stage_table(stages):
+    """Expand (end_s, users, spawn_rate) stages into one entry per second."""
+    table = []
+    for end, users, spawn_rate in stages:
+        table.extend([(users, spawn_rate)] * (end - len(table)))
+    return tuple(table)
 
 
 class AggressiveSpikeShape(LoadTestShape):
@@ -52,10 +185,9 @@ class AggressiveSpikeShape(LoadTestShape):
         (60, 400, 200),   # hold
         (70, 50, 50),     # cool down
     ]
+    # (users, spawn_rate) for each whole second of the run, indexed directly.
+    _table = _stage_table(stages)
 
     def tick(self):
-        run_time = self.get_run_time()
-        for stage_end, users, spawn_rate in self.stages:
-            if run_time < stage_end:
-                return users, spawn_rate
-        return None
+        t = int(self.get_run_time())
+        return self._table[t] if t < len(self._table) else None
@@ -13,9 +13,14 @@ export MODEL_MODE="${MODEL_MODE:-warm}"
 export SEED="${SEED:-42}"
 export BASELINE_SHARED_CONCURRENCY="${BASELINE_SHARED_CONCURRENCY:-24}"
 export BASELINE_REQUEST_DEADLINE_S="${BASELINE_REQUEST_DEADLINE_S:-5}"
+export BASELINE_BLOCKING_POOL="${BASELINE_BLOCKING_POOL:-0}"
+UVICORN_LOOP="${UVICORN_LOOP:-uvloop}"
+UVICORN_HTTP="${UVICORN_HTTP:-httptools}"
 
 echo "=== Starting BASELINE combined_api on :8000 (MODEL_MODE=$MODEL_MODE) ==="
 exec python -m uvicorn apps.combined_api:app \
     --host 0.0.0.0 \
     --port 8000 \
+    --loop "$UVICORN_LOOP" \
+    --http "$UVICORN_HTTP" \
     --log-level info
@@ -5,17 +5,24 @@
 # Usage:
 #   ./scripts/run_fixed.sh
 #   MODEL_MODE=cold ./scripts/run_fixed.sh
+#
+# Both services run as a single process: the nonblocking queue and result
+# store, and the blocking counters and admission limit, are all in memory.
 
 set -euo pipefail
 cd "$(dirname "$0")/.."
 
 export MODEL_MODE="${MODEL_MODE:-warm}"
 export SEED="${SEED:-42}"
+UVICORN_LOOP="${UVICORN_LOOP:-uvloop}"
+UVICORN_HTTP="${UVICORN_HTTP:-httptools}"
 
 echo "=== Starting FIXED nonblocking_api on :8001 ==="
 python -m uvicorn apps.nonblocking_api:app \
     --host 0.0.0.0 \
     --port 8001 \
+    --loop "$UVICORN_LOOP" \
+    --http "$UVICORN_HTTP" \
     --log-level info &
 PID_NB=$!
 
@@ -23,6 +30,8 @@ echo "=== Starting FIXED blocking_api on :8002 ==="
 python -m uvicorn apps.blocking_api:app \
     --host 0.0.0.0 \
     --port 8002 \
+    --loop "$UVICORN_LOOP" \
+    --http "$UVICORN_HTTP" \
     --log-level info &
 PID_BLK=$!
 